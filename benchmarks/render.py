@@ -0,0 +1,104 @@
+"""
+Course detail render benchmark.
+
+Builds a throwaway test database with one course holding a full 400-student
+roster (every student graded) and times GET /courses/<id>/:
+
+- template compile cost paid per request without the cached loader
+- full request with the roster fragments cold (cache cleared each time)
+- full request with the roster fragments warm
+
+Usage:
+    python benchmarks/render.py [--runs 20] [--students 400]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ums.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.template import engines  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from courses.models import Course, Enrollment, Grade, Student, User  # noqa: E402
+
+
+def populate(students):
+    professor = User.objects.create_user('bench-prof', password='pass', role=User.Role.PROFESSOR)
+    course = Course.objects.create(name='Benchmark', code='BENCH', capacity=400)
+    Student.objects.bulk_create(
+        Student(name=f'Student {i}', email=f'student{i}@example.com', student_id=f'B{i:05d}')
+        for i in range(students)
+    )
+    Enrollment.objects.bulk_create(Enrollment(student=s, course=course) for s in Student.objects.all())
+    Grade.objects.bulk_create(
+        Grade(enrollment=e, grade=75, graded_by=professor) for e in Enrollment.objects.filter(course=course)
+    )
+    # A few students outside the course for the eligible-student dropdown.
+    Student.objects.bulk_create(
+        Student(name=f'Other {i}', email=f'other{i}@example.com', student_id=f'O{i:05d}')
+        for i in range(50)
+    )
+    return professor, course
+
+
+def timed(fn, runs, before=None):
+    samples = []
+    for _ in range(runs):
+        if before:
+            before()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--students', type=int, default=400)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        professor, course = populate(args.students)
+        client = Client()
+        client.force_login(professor)
+        url = f'/courses/{course.pk}/'
+
+        def get():
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+
+        engine = engines['django'].engine
+        sources = [
+            engine.find_template(name)[0].source
+            for name in ('courses/course_detail.html', 'courses/base.html')
+        ]
+        compile_ms = timed(lambda: [engine.from_string(source) for source in sources], args.runs)
+        cold_ms = timed(get, args.runs, before=cache.clear)
+        get()
+        warm_ms = timed(get, args.runs)
+
+        print(f"course detail, {args.students} enrolled students (median of {args.runs})")
+        print(f"  template compile (uncached loader) : {compile_ms:8.2f} ms")
+        print(f"  request, fragments cold            : {cold_ms:8.2f} ms")
+        print(f"  request, fragments warm            : {warm_ms:8.2f} ms")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Worker cold-start benchmark.
+
+For each worker role (all / api / frontend) this boots a fresh interpreter,
+loads the WSGI application and serves one request, reporting:
+
+- import time, from ``python -X importtime`` (total and slowest modules)
+- time to first response, from the start of the worker script to the first
+  response body (URL confs and views are imported lazily on that request)
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--top 10] [--role api ...]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Path served per role; none of these touch the database for anonymous users.
+FIRST_REQUEST = {
+    'all': '/login/',
+    'api': '/api/',
+    'frontend': '/login/',
+}
+
+WORKER = r'''
+import time
+started = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+from ums.wsgi import application
+loaded = time.perf_counter()
+environ = {'PATH_INFO': %(path)r, 'HTTP_HOST': 'localhost'}
+setup_testing_defaults(environ)
+status = []
+body = b''.join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+done = time.perf_counter()
+print('%%s %%.6f %%.6f' %% (status[0].split()[0], loaded - started, done - started))
+'''
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def run_worker(role, importtime=False):
+    env = dict(os.environ, UMS_WORKER_ROLE=role, DJANGO_SETTINGS_MODULE='ums.settings')
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', WORKER % {'path': FIRST_REQUEST[role]}]
+    proc = subprocess.run(cmd, cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    status, load, first = proc.stdout.split()
+    return status, float(load), float(first), proc.stderr
+
+
+def parse_importtime(stderr):
+    """Return (total_us, [(cumulative_us, module), ...]) for top-level imports."""
+    modules = []
+    total = 0
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append((int(cumulative_us), name))
+        if len(indent) == 1:
+            total += int(cumulative_us)
+    modules.sort(reverse=True)
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--role', action='append', choices=sorted(FIRST_REQUEST))
+    args = parser.parse_args()
+
+    for role in args.role or ['all', 'api', 'frontend']:
+        loads, firsts = [], []
+        for _ in range(args.runs):
+            status, load, first, _ = run_worker(role)
+            loads.append(load)
+            firsts.append(first)
+        _, _, _, stderr = run_worker(role, importtime=True)
+        total_us, modules = parse_importtime(stderr)
+
+        print(f"== {role} (GET {FIRST_REQUEST[role]} -> {status}) ==")
+        print(f"  application load : {statistics.median(loads) * 1000:8.1f} ms (median of {args.runs})")
+        print(f"  first response   : {statistics.median(firsts) * 1000:8.1f} ms (median of {args.runs})")
+        print(f"  import time      : {total_us / 1000:8.1f} ms over {len(modules)} modules")
+        for cumulative_us, name in modules[:args.top]:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
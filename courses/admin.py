@@ -1,9 +1,41 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from .models import User, Student, Course, Enrollment, Grade, GradeAudit
 
 # Register your models here.
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that reads the planner's row estimate instead of running
+    COUNT(*) for unfiltered changelists on PostgreSQL. Small tables, filtered
+    querysets and other backends fall back to an exact count.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'role', 'is_staff')
@@ -24,19 +56,37 @@ class CourseAdmin(admin.ModelAdmin):
     readonly_fields = ('capacity',)
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(LargeTableAdmin):
     list_display = ('student', 'course', 'enrolled_at')
-    list_filter = ('course', 'enrolled_at')
+    list_select_related = ('student', 'course')
     search_fields = ('student__name', 'course__code')
+    autocomplete_fields = ('student', 'course')
+    date_hierarchy = 'enrolled_at'
 
 @admin.register(Grade)
-class GradeAdmin(admin.ModelAdmin):
+class GradeAdmin(LargeTableAdmin):
     list_display = ('enrollment', 'grade', 'graded_by', 'updated_at')
-    list_filter = ('graded_by', 'updated_at')
+    list_select_related = ('enrollment__student', 'enrollment__course', 'graded_by')
     search_fields = ('enrollment__student__name', 'enrollment__course__code')
+    autocomplete_fields = ('enrollment',)
+    raw_id_fields = ('graded_by',)
+    date_hierarchy = 'updated_at'
+    readonly_fields = ('finalized_at',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Finalized grades are frozen, as they are for the API.
+        if obj is not None and obj.finalized_at:
+            return ('enrollment', 'grade', 'graded_by', 'finalized_at')
+        return super().get_readonly_fields(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and obj.finalized_at:
+            return False
+        return super().has_delete_permission(request, obj)
 
 @admin.register(GradeAudit)
-class GradeAuditAdmin(admin.ModelAdmin):
+class GradeAuditAdmin(LargeTableAdmin):
     list_display = ('grade_obj', 'previous_grade', 'new_grade', 'changed_by', 'changed_at')
-    list_filter = ('changed_by', 'changed_at')
+    list_select_related = ('grade_obj__enrollment__student', 'grade_obj__enrollment__course', 'changed_by')
     readonly_fields = ('grade_obj', 'previous_grade', 'new_grade', 'changed_by', 'changed_at')
+    date_hierarchy = 'changed_at'
@@ -0,0 +1,207 @@
+"""
+Admission control for write endpoints.
+
+When enrollment opens, every request for a popular course queues on that
+course's row lock. Rather than letting sync workers pile up until everything
+times out, requests are admitted only if:
+
+- the user's token bucket has a token (USER_RATE),
+- the course's token bucket has a token (COURSE_RATE), and
+- fewer than MAX_CONCURRENT_WRITES admitted writes are in flight.
+
+Otherwise the request is answered immediately with 429 and a Retry-After
+header. Buckets and in-flight slots live in a counter store shared by all
+workers. SQLiteCounterStore keeps them in a local SQLite file, which covers
+every worker on one host. A multi-host deployment should point STORE at a
+class with the same three methods backed by a shared server.
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'STORE': 'courses.admission.SQLiteCounterStore',
+    'STORE_OPTIONS': {},
+    # (tokens per second, burst)
+    'USER_RATE': (5, 20),
+    'COURSE_RATE': (50, 100),
+    'MAX_CONCURRENT_WRITES': 16,
+    # Slots of a worker that died mid-request are reclaimed after this.
+    'SLOT_TIMEOUT': 30,
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'ADMISSION_CONTROL', {})}
+
+
+class SQLiteCounterStore:
+    """
+    Token buckets and concurrency slots in a SQLite file shared by local
+    workers. A store too busy to answer within ``timeout`` seconds reports
+    the request as over its limit, so contention on the store itself ends
+    in a 429 like any other overload.
+    """
+
+    # Seconds a client is asked to wait when the store itself is saturated.
+    BUSY_RETRY_AFTER = 1.0
+
+    def __init__(self, path, timeout=5):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS slots (token TEXT PRIMARY KEY, name TEXT, expires REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS slots_name ON slots (name, expires)')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _immediate(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    def take(self, key, rate, burst):
+        """Take one token from ``key``. Returns seconds to wait, 0 if taken."""
+        now = time.time()
+        try:
+            with self._immediate() as conn:
+                row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+        except sqlite3.OperationalError:
+            logger.warning("Admission store busy; turning request away", exc_info=True)
+            return self.BUSY_RETRY_AFTER
+        return wait
+
+    def acquire(self, name, limit, timeout):
+        """Claim one of ``limit`` slots. Returns a token to release, or None."""
+        now = time.time()
+        try:
+            with self._immediate() as conn:
+                conn.execute('DELETE FROM slots WHERE name = ? AND expires < ?', (name, now))
+                (in_use,) = conn.execute('SELECT COUNT(*) FROM slots WHERE name = ?', (name,)).fetchone()
+                token = None
+                if in_use < limit:
+                    token = uuid.uuid4().hex
+                    conn.execute('INSERT INTO slots (token, name, expires) VALUES (?, ?, ?)', (token, name, now + timeout))
+        except sqlite3.OperationalError:
+            logger.warning("Admission store busy; turning request away", exc_info=True)
+            return None
+        return token
+
+    def release(self, token):
+        try:
+            self._connection().execute('DELETE FROM slots WHERE token = ?', (token,))
+        except sqlite3.OperationalError:
+            # The slot expires after SLOT_TIMEOUT instead.
+            logger.warning("Admission store busy; slot left to expire", exc_info=True)
+
+
+_stores = {}
+
+
+def get_store():
+    config = _config()
+    options = config['STORE_OPTIONS'] or {'path': settings.BASE_DIR / 'admission.sqlite3'}
+    cache_key = (config['STORE'], repr(sorted(options.items())))
+    if cache_key not in _stores:
+        _stores[cache_key] = import_string(config['STORE'])(**options)
+    return _stores[cache_key]
+
+
+@receiver(setting_changed)
+def _reset_stores(setting, **kwargs):
+    if setting == 'ADMISSION_CONTROL':
+        _stores.clear()
+
+
+def _too_many_requests(wait):
+    response = JsonResponse({'error': 'Too many requests. Please retry shortly.'}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def _as_id(value):
+    # Course ids come from request data; anything that isn't a positive int
+    # gets no bucket rather than a new row per distinct string.
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def admission_controlled(course_id=None):
+    """
+    Decorate a write view taking ``request`` first. ``course_id`` is an
+    optional callable ``(request, *args, **kwargs) -> course id`` for the
+    per-course bucket; values that aren't positive integers are skipped.
+    Use ``method_decorator`` on viewset methods.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            config = _config()
+            if not config['ENABLED']:
+                return view_func(request, *args, **kwargs)
+
+            store = get_store()
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                client = f'user:{user.pk}'
+            else:
+                client = f"addr:{request.META.get('REMOTE_ADDR')}"
+            buckets = [(client, config['USER_RATE'])]
+            course = _as_id(course_id(request, *args, **kwargs)) if course_id else None
+            if course is not None:
+                buckets.append((f'course:{course}', config['COURSE_RATE']))
+
+            for key, (rate, burst) in buckets:
+                wait = store.take(key, rate, burst)
+                if wait:
+                    return _too_many_requests(wait)
+
+            token = store.acquire('writes', config['MAX_CONCURRENT_WRITES'], config['SLOT_TIMEOUT'])
+            if token is None:
+                return _too_many_requests(1)
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                store.release(token)
+
+        return wrapper
+    return decorator
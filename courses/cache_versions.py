@@ -0,0 +1,36 @@
+"""
+Per-course version stamps for template fragment caching.
+
+Fragments that depend on a course's roster or grades include Course.version
+in their cache key, so bumping it invalidates every fragment for that course
+at once. The stamp lives on the course row rather than in the cache: a write
+bumps it with one UPDATE inside its own transaction (enrollment and grade
+writes already hold that row's lock), and a reader gets it with the course it
+loads anyway.
+
+A bump moves the stamp to the current time in nanoseconds, or one past its
+old value if that is later. Stamps never repeat for a course, and the newest
+stamp across all courses moves forward on every write, which is what the
+dashboard snapshot watches (see courses/dashboard.py).
+"""
+import time
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import Course
+
+
+def next_version(version):
+    return max(version + 1, time.time_ns())
+
+
+def bump_course_versions(course_ids):
+    """``course_ids`` may be a list or a values() queryset of ids."""
+    Course.objects.filter(pk__in=course_ids).update(
+        version=Greatest(F('version') + 1, Value(time.time_ns()))
+    )
+
+
+def bump_course_version(course_id):
+    bump_course_versions([course_id])
@@ -0,0 +1,103 @@
+"""
+Precomputed professor dashboard.
+
+The dashboard is served from a snapshot: a plain list of course cards stored
+in the cache, together with the course signature it was built from (the
+newest Course.version and the number of courses). Writes only bump their
+course's version (courses/cache_versions.py), so a burst of writes costs one
+rebuild rather than one per write. A read that finds the signature moved or
+the snapshot older than DASHBOARD_SNAPSHOT_FRESH_SECONDS still serves it and
+schedules a single background rebuild (stale-while-revalidate).
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max
+
+from .models import Course
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'courses:dashboard:snapshot'
+REFRESH_LOCK_KEY = 'courses:dashboard:refreshing'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def build_course_cards():
+    return list(
+        Course.objects
+        .annotate(
+            seat_count=Count('enrollments', distinct=True),
+            graded_count=Count('enrollments__grade', distinct=True),
+        )
+        .order_by('id')
+        .values('id', 'code', 'name', 'capacity', 'seat_count', 'graded_count')
+    )
+
+
+def course_signature():
+    """Changes whenever any course, enrollment or grade does."""
+    row = Course.objects.aggregate(version=Max('version'), count=Count('id'))
+    return row['version'], row['count']
+
+
+def refresh_snapshot():
+    """Rebuild the snapshot and store it. Returns the stored snapshot."""
+    # Signature first: a write landing mid-build then only causes one more
+    # rebuild, never a snapshot that claims to be newer than its cards.
+    signature = course_signature()
+    snapshot = {'built_at': time.time(), 'signature': signature, 'cards': build_course_cards()}
+    cache.set(SNAPSHOT_KEY, snapshot, _setting('DASHBOARD_SNAPSHOT_TIMEOUT', 24 * 60 * 60))
+    return snapshot
+
+
+def _refresh_and_unlock():
+    try:
+        refresh_snapshot()
+    except Exception:
+        logger.exception("Dashboard snapshot refresh failed")
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+
+
+def _refresh_in_background():
+    # The thread owns its connection; close it rather than leak it.
+    try:
+        _refresh_and_unlock()
+    finally:
+        connection.close()
+
+
+def schedule_refresh():
+    """Start one rebuild unless another process or thread already is."""
+    if not cache.add(REFRESH_LOCK_KEY, True, _setting('DASHBOARD_SNAPSHOT_REFRESH_LOCK_SECONDS', 60)):
+        return
+    if _setting('DASHBOARD_SNAPSHOT_BACKGROUND_REFRESH', True):
+        threading.Thread(target=_refresh_in_background, daemon=True).start()
+    else:
+        _refresh_and_unlock()
+
+
+def get_course_cards():
+    """
+    Return the dashboard course cards: one cache read and one aggregate over
+    the courses table.
+
+    Only a cold cache builds synchronously; a stale snapshot is returned
+    as-is while a refresh is scheduled.
+    """
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        return refresh_snapshot()['cards']
+
+    age = time.time() - snapshot['built_at']
+    if snapshot.get('signature') != course_signature() or age > _setting('DASHBOARD_SNAPSHOT_FRESH_SECONDS', 30):
+        schedule_refresh()
+    return snapshot['cards']
@@ -0,0 +1,135 @@
+"""
+In-process index of which students are enrolled in which courses.
+
+Each course the process has looked at maps to a sorted ``array('q')`` of
+student ids, loaded on first use. The array gives membership by binary search
+and seat counts by length. Enrollments committed by this process are applied
+immediately through signals. Enrollments committed by other workers are
+picked up from the change log (ChangeLogEntry). The index remembers the last
+entry it applied and, at most every ENROLLMENT_INDEX_MAX_STALENESS seconds,
+replays any newer enrollment entries. An update (an enrollment moved to
+another student or course) carries the pair it replaced under ``previous``,
+which is removed before the new pair is added. If the last applied entry has
+disappeared (log pruned, database restored), or an update lacks ``previous``,
+the index is dropped and reloaded.
+
+The index only answers fast-path questions ("already enrolled?", "who is
+eligible?") and is never the last word on a rejection: a duplicate it reports
+is confirmed against the Enrollment table, a full course is counted under its
+row lock, and the unique constraint on Enrollment decides duplicates it missed.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .change_feed import read_changes
+from .models import ChangeLogEntry, Enrollment
+
+
+class EnrollmentIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._courses = {}
+            # (pk, created_at) of the last change log entry applied
+            self._stamp = None
+            self._checked_at = None
+
+    # --- reads ---
+
+    def is_enrolled(self, course_id, student_id):
+        students = self._students(course_id)
+        i = bisect_left(students, student_id)
+        return i < len(students) and students[i] == student_id
+
+    def seat_count(self, course_id):
+        return len(self._students(course_id))
+
+    def student_ids(self, course_id):
+        """Enrolled student ids for ``course_id``, sorted."""
+        return self._students(course_id).tolist()
+
+    # --- updates ---
+
+    def add(self, course_id, student_id):
+        with self._lock:
+            students = self._courses.get(course_id)
+            if students is None:
+                return
+            i = bisect_left(students, student_id)
+            if i == len(students) or students[i] != student_id:
+                students.insert(i, student_id)
+
+    def remove(self, course_id, student_id):
+        with self._lock:
+            students = self._courses.get(course_id)
+            if students is None:
+                return
+            i = bisect_left(students, student_id)
+            if i < len(students) and students[i] == student_id:
+                del students[i]
+
+    # --- internals ---
+
+    def _students(self, course_id):
+        course_id = int(course_id)
+        self._sync()
+        students = self._courses.get(course_id)
+        if students is None:
+            loaded = array('q', sorted(
+                Enrollment.objects.filter(course_id=course_id).values_list('student_id', flat=True)
+            ))
+            with self._lock:
+                students = self._courses.setdefault(course_id, loaded)
+        return students
+
+    def _sync(self):
+        max_staleness = getattr(settings, 'ENROLLMENT_INDEX_MAX_STALENESS', 0.25)
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < max_staleness:
+            return
+        self._checked_at = now
+
+        if self._stamp is None:
+            last = ChangeLogEntry.objects.order_by('-pk').values_list('pk', 'created_at').first()
+            with self._lock:
+                self._stamp = last or (0, None)
+            return
+
+        # Re-read the last applied entry along with anything newer, so one
+        # query both validates the stamp and fetches the delta.
+        pk, created_at = self._stamp
+        entries, _, has_more = read_changes(pk - 1 if pk else 0)
+        if pk and (not entries or entries[0].pk != pk or entries[0].created_at != created_at):
+            self.clear()
+            return self._sync()
+        entries = entries[1:] if pk else entries
+
+        while True:
+            for entry in entries:
+                if entry.entity == ChangeLogEntry.Entity.ENROLLMENT:
+                    if entry.action == ChangeLogEntry.Action.DELETE:
+                        self.remove(entry.course_id, entry.payload['student'])
+                    elif entry.action == ChangeLogEntry.Action.UPDATE:
+                        previous = entry.payload.get('previous')
+                        if previous is None:
+                            # Logged before updates recorded the old pair
+                            self.clear()
+                            return self._sync()
+                        self.remove(previous['course'], previous['student'])
+                        self.add(entry.course_id, entry.payload['student'])
+                    else:
+                        self.add(entry.course_id, entry.payload['student'])
+                self._stamp = (entry.pk, entry.created_at)
+            if not (entries and has_more):
+                break
+            entries, _, has_more = read_changes(self._stamp[0])
+
+
+enrollment_index = EnrollmentIndex()
@@ -0,0 +1,150 @@
+"""
+Term-end grade finalization, used by `manage.py finalize_term`.
+
+Courses are split into fixed shards by id so a rerun produces the same
+shards. Each shard is processed by finalize_shard, which may run in a worker
+process. For each course in the shard it:
+
+1. locks the course row, which enrollment and grade writes also take, so
+   neither can land mid-finalization,
+2. checks that every enrollment has a grade (a course that fails this check
+   is reported as incomplete and left untouched),
+3. stamps finalized_at on all grades with one bulk UPDATE and writes one final
+   GradeAudit and one ChangeLogEntry per grade it froze,
+4. writes <output_dir>/courses/<id>-<code>.csv.
+
+A shard whose courses were all finalized leaves a marker in
+<output_dir>/shards/. Reruns skip a marked shard if it still holds the same
+courses. Finalizing a course again is a no-op, so a shard that died half-way
+can simply be run again.
+"""
+import csv
+import json
+import os
+from pathlib import Path
+
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .cache_versions import bump_course_version
+from .models import ChangeLogEntry, Course, Enrollment, Grade, GradeAudit
+
+
+def lock_for_grading(enrollment):
+    """
+    Take the course row lock that finalize_course holds, so a grade write
+    can't read finalized_at=None and then save over a grade finalized in
+    between. Call inside a transaction before checking finalized_at.
+    """
+    Course.objects.select_for_update().only('pk').get(pk=enrollment.course_id)
+
+
+def is_finalized(grade):
+    """Whether ``grade`` is finalized in the database, whatever the instance says."""
+    return Grade.objects.filter(pk=grade.pk, finalized_at__isnull=False).exists()
+
+
+def plan_shards(shard_size):
+    course_ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+    return [course_ids[i:i + shard_size] for i in range(0, len(course_ids), shard_size)]
+
+
+def shard_marker(output_dir, index):
+    return Path(output_dir) / 'shards' / f'{index:05d}.json'
+
+
+def completed_shard(output_dir, index, course_ids):
+    """Summaries from a finished shard's marker, or None if it must (re)run."""
+    marker = shard_marker(output_dir, index)
+    if not marker.exists():
+        return None
+    summaries = json.loads(marker.read_text())['courses']
+    # Courses added since the last run shift the shard boundaries.
+    if [summary['course'] for summary in summaries] != list(course_ids):
+        return None
+    return summaries
+
+
+def _write_atomic(path, write):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.tmp')
+    with open(tmp, 'w', newline='') as fh:
+        write(fh)
+    os.replace(tmp, path)
+
+
+def finalize_course(course_id, output_dir, user_id=None):
+    """Finalize one course. Returns a summary dict for the term report."""
+    with transaction.atomic():
+        course = Course.objects.select_for_update().get(pk=course_id)
+        rows = list(
+            Enrollment.objects
+            .filter(course=course)
+            .order_by('student__student_id')
+            .values_list('student__student_id', 'student__name', 'grade__id', 'grade__grade', 'grade__finalized_at')
+        )
+        missing = [student_id for student_id, _, grade_id, _, _ in rows if grade_id is None]
+        summary = {
+            'course': course.pk,
+            'code': course.code,
+            'enrolled': len(rows),
+            'missing_grades': missing,
+            'frozen': 0,
+        }
+        if missing:
+            summary['status'] = 'incomplete'
+            return summary
+
+        now = timezone.now()
+        to_freeze = {grade_id: grade for _, _, grade_id, grade, finalized_at in rows if finalized_at is None}
+        if to_freeze:
+            Grade.objects.filter(pk__in=to_freeze).update(finalized_at=now)
+            GradeAudit.objects.bulk_create(
+                GradeAudit(grade_obj_id=grade_id, previous_grade=grade, new_grade=grade, changed_by_id=user_id)
+                for grade_id, grade in to_freeze.items()
+            )
+            ChangeLogEntry.objects.bulk_create(
+                ChangeLogEntry(
+                    entity=ChangeLogEntry.Entity.GRADE,
+                    action=ChangeLogEntry.Action.UPDATE,
+                    object_id=grade_id,
+                    course_id=course.pk,
+                    payload={'grade': str(grade), 'finalized_at': now.isoformat()},
+                )
+                for grade_id, grade in to_freeze.items()
+            )
+            bump_course_version(course.pk)
+        summary['frozen'] = len(to_freeze)
+
+    def write_report(fh):
+        writer = csv.writer(fh)
+        writer.writerow(['student_id', 'name', 'grade'])
+        for student_id, name, _, grade, _ in rows:
+            writer.writerow([student_id, name, grade])
+
+    report = Path(output_dir) / 'courses' / f'{course.pk}-{slugify(course.code)}.csv'
+    _write_atomic(report, write_report)
+    summary['status'] = 'finalized'
+    summary['report'] = str(report)
+    return summary
+
+
+def finalize_shard(index, course_ids, output_dir, user_id=None):
+    """Finalize every course in a shard. Returns (index, [course summaries])."""
+    summaries = [finalize_course(course_id, output_dir, user_id) for course_id in course_ids]
+    if all(summary['status'] == 'finalized' for summary in summaries):
+        _write_atomic(
+            shard_marker(output_dir, index),
+            lambda fh: json.dump({'shard': index, 'courses': summaries}, fh),
+        )
+    return index, summaries
+
+
+def init_worker():
+    """Process pool initializer: make sure Django is set up and no parent connection is reused."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
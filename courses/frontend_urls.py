@@ -1,10 +1,16 @@
-from django.urls import path
-from .views import (
+from django.urls import path, include
+from .frontend_views import (
     ProfessorLoginView, ProfessorDashboardView, StudentCreateView, CourseDetailView,
     enroll_student_view, submit_grade_api
 )
 from django.contrib.auth.views import LogoutView
 
+# Helper API for the grade form. A plain Django view, served by frontend
+# workers under the API prefix so the page's fetch URL stays the same.
+grade_form_urlpatterns = [
+    path('grades/submit/', submit_grade_api, name='submit-grade-api'),
+]
+
 urlpatterns = [
     path('login/', ProfessorLoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
@@ -12,7 +18,5 @@ urlpatterns = [
     path('students/new/', StudentCreateView.as_view(), name='student-create'),
     path('courses/<int:pk>/', CourseDetailView.as_view(), name='course-detail'),
     path('courses/<int:course_id>/enroll/', enroll_student_view, name='enroll-student-view'),
-    
-    # Helper API for frontend (keep here or use main API? keep here for now)
-    # Helper API moved to courses/urls.py
+    path('api/', include(grade_form_urlpatterns)),
 ]
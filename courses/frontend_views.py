@@ -0,0 +1,159 @@
+import json
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.views import LoginView
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse_lazy
+from django.views.decorators.http import require_POST
+from django.views.generic import ListView, DetailView, CreateView
+from .admission import admission_controlled
+from .dashboard import get_course_cards
+from .enrollment_index import enrollment_index
+from .finalization import lock_for_grading
+from .idempotency import idempotent
+from .models import Student, Course, Enrollment, Grade, GradeAudit, User
+
+# Frontend (server-rendered) views. Kept apart from the DRF views in
+# views.py so frontend-only workers never import rest_framework.
+
+class ProfessorLoginView(LoginView):
+    template_name = 'courses/login.html'
+    redirect_authenticated_user = True
+    
+    def get_success_url(self):
+        return reverse_lazy('professor-dashboard')
+
+class ProfessorDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+    model = Course
+    template_name = 'courses/dashboard.html'
+    context_object_name = 'courses'
+
+    def test_func(self):
+        return self.request.user.role == User.Role.PROFESSOR or self.request.user.is_superuser
+
+    def get_queryset(self):
+        # Precomputed course cards, see courses/dashboard.py
+        return get_course_cards()
+
+class StudentCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+    model = Student
+    fields = ['name', 'email', 'student_id']
+    template_name = 'courses/student_form.html'
+    success_url = reverse_lazy('professor-dashboard')
+
+    def test_func(self):
+        return self.request.user.role == User.Role.PROFESSOR or self.request.user.is_superuser
+
+    def form_valid(self, form):
+        messages.success(self.request, "Student created successfully.")
+        return super().form_valid(form)
+
+class CourseDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+    model = Course
+    template_name = 'courses/course_detail.html'
+
+    def test_func(self):
+        return self.request.user.role == User.Role.PROFESSOR or self.request.user.is_superuser
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['enrollments'] = self.object.enrollments.select_related('student', 'grade').all()
+        # For the dropdown: everyone not already enrolled, per the in-process index
+        context['all_students'] = Student.objects.exclude(pk__in=enrollment_index.student_ids(self.object.pk))
+        return context
+
+@require_POST
+@admission_controlled(course_id=lambda request, course_id: course_id)
+def enroll_student_view(request, course_id):
+    if not request.user.is_authenticated or request.user.role != User.Role.PROFESSOR:
+        messages.error(request, "Unauthorized")
+        return redirect('professor-dashboard')
+
+    student_id = request.POST.get('student_id')
+    course = get_object_or_404(Course, pk=course_id)
+    student = get_object_or_404(Student, pk=student_id)
+
+    # Turn away duplicates before queuing on the course lock. The index only
+    # says who to check; "full" is only decided by the COUNT below.
+    if (enrollment_index.is_enrolled(course.pk, student.pk)
+            and Enrollment.objects.filter(course=course, student=student).exists()):
+        messages.error(request, "Student already enrolled.")
+        return redirect('course-detail', pk=course_id)
+
+    try:
+        with transaction.atomic():
+            course_lock = Course.objects.select_for_update().get(pk=course_id)
+            if course_lock.enrollments.count() >= course_lock.capacity:
+                messages.error(request, "Course is full.")
+            else:
+                # The unique constraint decides duplicates the index missed
+                try:
+                    with transaction.atomic():
+                        Enrollment.objects.create(student=student, course=course)
+                except IntegrityError:
+                    messages.error(request, "Student already enrolled.")
+                else:
+                    messages.success(request, f"Enrolled {student.name} successfully.")
+    except Exception as e:
+        messages.error(request, f"Error: {e}")
+
+    return redirect('course-detail', pk=course_id)
+
+@require_POST
+@idempotent
+@admission_controlled()
+def submit_grade_api(request):
+    """
+    Helper API for the frontend JS to submit/update grades easily.
+    Expects JSON: { enrollment: id, grade: value }
+    """
+    if not request.user.is_authenticated or request.user.role != User.Role.PROFESSOR:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        enrollment_id = data.get('enrollment')
+        grade_value = data.get('grade')
+        
+        enrollment = get_object_or_404(Enrollment, pk=enrollment_id)
+        
+        # Grade, audit and change-log rows commit together
+        with transaction.atomic():
+            lock_for_grading(enrollment)
+            # Check if grade exists
+            grade_obj, created = Grade.objects.get_or_create(enrollment=enrollment, defaults={'grade': grade_value, 'graded_by': request.user})
+
+            if not created:
+                if grade_obj.finalized_at:
+                    return JsonResponse({'error': 'Grade has been finalized.'}, status=400)
+
+                # Update existing
+                previous_grade = grade_obj.grade
+                grade_obj.grade = grade_value
+                grade_obj.graded_by = request.user
+                grade_obj.save(update_fields=['grade', 'graded_by', 'updated_at'])
+
+                # Audit manual check (signals or override save would affect this, but our ViewSet had the audit logic)
+                # Since we are modifying directly, we should manually invoke Audit or use a Service layer.
+                # Reuse the Logic from the ViewSet???
+                # Or just Quick create audit here.
+                GradeAudit.objects.create(
+                    grade_obj=grade_obj,
+                    previous_grade=previous_grade,
+                    new_grade=grade_value,
+                    changed_by=request.user
+                )
+            else:
+                 # Audit for create
+                 GradeAudit.objects.create(
+                    grade_obj=grade_obj,
+                    new_grade=grade_value,
+                    changed_by=request.user
+                )
+
+        return JsonResponse({'status': 'success'})
+    except Exception as e:
+         return JsonResponse({'error': str(e)}, status=400)
+
@@ -0,0 +1,118 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that may retry a write sends an ``Idempotency-Key`` header. The first
+request with a given key runs normally and its response is stored, together
+with a digest of the request, in the cache for IDEMPOTENCY_KEY_TTL seconds.
+A retry with the same key and the same request is answered from the store
+without running the view again (no locks taken, no audit rows written). The
+same key with a different request is rejected with 422, and a retry that
+arrives while the original is still running gets 409. Server errors and
+transient rejections (TRANSIENT_STATUSES, e.g. a 429 from admission control)
+are not stored, so the client can retry them with the same key.
+
+Keys are scoped per user and per path. The store (IDEMPOTENCY_CACHE) must be
+shared by every worker, otherwise a retry that lands on another worker runs
+again; a local-memory cache is refused with ImproperlyConfigured.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, JsonResponse
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+# Request Timeout, Conflict, Locked, Too Early, Too Many Requests
+TRANSIENT_STATUSES = {408, 409, 423, 425, 429}
+
+
+def _store():
+    alias = getattr(settings, 'IDEMPOTENCY_CACHE', 'default')
+    store = caches[alias]
+    if isinstance(store, LocMemCache):
+        raise ImproperlyConfigured(
+            f"IDEMPOTENCY_CACHE {alias!r} is a local-memory cache, which each worker "
+            "process keeps separately. Point it at a shared cache."
+        )
+    return store
+
+
+def _digest(*parts):
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part if isinstance(part, bytes) else str(part).encode())
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def _freeze(response):
+    # DRF responses are stored as data and re-rendered on replay so content
+    # negotiation still applies; plain Django responses are stored as bytes.
+    if hasattr(response, 'data'):
+        return {'status': response.status_code, 'data': response.data}
+    return {
+        'status': response.status_code,
+        'content': response.content,
+        'content_type': response['Content-Type'],
+    }
+
+
+def _thaw(stored):
+    if 'data' in stored:
+        from rest_framework.response import Response
+        response = Response(stored['data'], status=stored['status'])
+    else:
+        response = HttpResponse(stored['content'], status=stored['status'], content_type=stored['content_type'])
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """
+    Decorate a view taking ``request`` as its first argument. Use
+    ``method_decorator(idempotent)`` on class-based or viewset methods.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        user = getattr(request, 'user', None)
+        if not key or user is None or not user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.'}, status=400)
+
+        store = _store()
+        store_key = f'idempotency:{_digest(user.pk, request.path, key)}'
+        lock_key = f'{store_key}:lock'
+        fingerprint = _digest(request.method, request.path, request.body)
+
+        stored = store.get(store_key)
+        if stored is None:
+            if not store.add(lock_key, fingerprint, getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 30)):
+                return JsonResponse({'error': f'A request with this {HEADER} is already in progress.'}, status=409)
+            try:
+                # The original may have stored its response and released the
+                # lock between our get() and add().
+                stored = store.get(store_key)
+                if stored is None:
+                    response = view_func(request, *args, **kwargs)
+                    if response.status_code < 500 and response.status_code not in TRANSIENT_STATUSES:
+                        store.set(
+                            store_key,
+                            {'fingerprint': fingerprint, 'response': _freeze(response)},
+                            getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60),
+                        )
+                    return response
+            finally:
+                store.delete(lock_key)
+
+        if stored['fingerprint'] != fingerprint:
+            return JsonResponse({'error': f'{HEADER} was already used for a different request.'}, status=422)
+        return _thaw(stored['response'])
+
+    return wrapper
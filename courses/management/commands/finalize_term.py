@@ -0,0 +1,118 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from courses.finalization import completed_shard, finalize_shard, init_worker, plan_shards
+from courses.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Close a term: check that every enrollment is graded, freeze the grades "
+        "and write per-course reports. Courses are processed in shards across a "
+        "process pool; rerunning skips shards that already completed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('term', help="Term label, used for the default output directory.")
+        parser.add_argument('--output-dir', help="Where reports go (default: term_reports/<term>).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes; 0 runs every shard in this process.")
+        parser.add_argument('--shard-size', type=int, default=50, help="Courses per shard.")
+        parser.add_argument('--user', help="Username recorded on the final audit entries.")
+
+    def handle(self, *args, **options):
+        output_dir = Path(options['output_dir'] or settings.BASE_DIR / 'term_reports' / options['term'])
+        if options['shard_size'] < 1:
+            raise CommandError("--shard-size must be at least 1.")
+        user_id = None
+        if options['user']:
+            try:
+                user_id = User.objects.get(username=options['user']).pk
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}.")
+
+        shards = plan_shards(options['shard_size'])
+        results = []
+        pending = []
+        for index, course_ids in enumerate(shards):
+            summaries = completed_shard(output_dir, index, course_ids)
+            if summaries is None:
+                pending.append((index, course_ids))
+            else:
+                results.extend(summaries)
+        self.stdout.write(
+            f"{len(shards)} shards, {len(shards) - len(pending)} already done, {len(pending)} to run."
+        )
+
+        workers = options['workers']
+        if workers > 0 and connection.vendor == 'sqlite':
+            # SQLite allows one writer at a time; parallel shards only collide.
+            self.stdout.write("SQLite database: running shards in this process.")
+            workers = 0
+
+        started = time.monotonic()
+        done = len(shards) - len(pending)
+        failed = []
+        for index, summaries, error in self._run(pending, output_dir, user_id, workers):
+            done += 1
+            if error is not None:
+                failed.append(index)
+                self.stderr.write(f"[{done}/{len(shards)}] shard {index} failed: {error}")
+                continue
+            results.extend(summaries)
+            frozen = sum(s['frozen'] for s in summaries)
+            incomplete = [s['code'] for s in summaries if s['status'] != 'finalized']
+            line = f"[{done}/{len(shards)}] shard {index}: {len(summaries)} courses, {frozen} grades frozen"
+            if incomplete:
+                self.stdout.write(self.style.WARNING(f"{line}, incomplete: {', '.join(incomplete)}"))
+            else:
+                self.stdout.write(line)
+
+        results.sort(key=lambda summary: summary['course'])
+        incomplete = [s for s in results if s['status'] != 'finalized']
+        summary_path = output_dir / 'summary.json'
+        output_dir.mkdir(parents=True, exist_ok=True)
+        with open(summary_path, 'w') as fh:
+            json.dump({'term': options['term'], 'courses': results}, fh, indent=2)
+
+        elapsed = time.monotonic() - started
+        if failed:
+            raise CommandError(f"Shards {', '.join(map(str, failed))} failed; rerun to retry them.")
+        if incomplete:
+            raise CommandError(
+                f"{len(incomplete)} courses have ungraded enrollments; see {summary_path}. "
+                "Grade them and rerun to finish the remaining shards."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Finalized {len(results)} courses in {elapsed:.1f}s. Reports in {output_dir}."
+        ))
+
+    def _run(self, pending, output_dir, user_id, workers):
+        """Yield (index, summaries, error) per shard as shards complete."""
+        if workers <= 0:
+            for index, course_ids in pending:
+                try:
+                    yield (*finalize_shard(index, course_ids, output_dir, user_id), None)
+                except Exception as e:
+                    yield index, [], e
+            return
+
+        # Children must open their own database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            futures = {
+                pool.submit(finalize_shard, index, course_ids, output_dir, user_id): index
+                for index, course_ids in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    yield (*future.result(), None)
+                except Exception as e:
+                    yield futures[future], [], e
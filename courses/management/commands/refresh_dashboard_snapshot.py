@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from courses.dashboard import refresh_snapshot
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached professor dashboard snapshot (run from cron or a scheduler)."
+
+    def handle(self, *args, **options):
+        snapshot = refresh_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Dashboard snapshot rebuilt with {len(snapshot['cards'])} courses."))
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.3 on 2026-10-19 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_changelogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grade',
+            name='finalized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
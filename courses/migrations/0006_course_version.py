@@ -0,0 +1,19 @@
+# Generated by Django 4.1.3 on 2026-10-19 11:00
+
+from django.db import migrations, models
+import time
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_grade_finalized_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='version',
+            field=models.BigIntegerField(default=time.time_ns, editable=False),
+        ),
+    ]
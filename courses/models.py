@@ -1,3 +1,4 @@
+import time
 from decimal import Decimal
 from django.db import models
 from django.contrib.auth.models import AbstractUser
@@ -24,6 +25,9 @@ class Course(models.Model):
     code = models.CharField(max_length=20, unique=True)
     capacity = models.PositiveIntegerField(default=400, validators=[MaxValueValidator(400)])
     description = models.TextField(blank=True)
+    # Bumped with every change to the course, its roster or its grades; keys
+    # the cached course fragments (see courses/cache_versions.py).
+    version = models.BigIntegerField(default=time.time_ns, editable=False)
 
     def __str__(self):
         return f"{self.code} - {self.name}"
@@ -31,7 +35,7 @@ class Course(models.Model):
 class Enrollment(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='enrollments')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
-    enrolled_at = models.DateTimeField(auto_now_add=True)
+    enrolled_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         unique_together = ('student', 'course')
@@ -43,7 +47,9 @@ class Grade(models.Model):
     enrollment = models.OneToOneField(Enrollment, on_delete=models.CASCADE, related_name='grade')
     grade = models.DecimalField(max_digits=5, decimal_places=2, validators=[MinValueValidator(Decimal('0.00')), MaxValueValidator(Decimal('100.00'))])
     graded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Set by `manage.py finalize_term`; finalized grades can no longer change.
+    finalized_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Grade for {self.enrollment}: {self.grade}"
@@ -53,7 +59,34 @@ class GradeAudit(models.Model):
     previous_grade = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     new_grade = models.DecimalField(max_digits=5, decimal_places=2)
     changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
-    changed_at = models.DateTimeField(auto_now_add=True)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
         return f"Audit for {self.grade_obj} at {self.changed_at}"
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only feed of enrollment and grade changes, written in the same
+    transaction as the change itself. The primary key is the feed cursor.
+    """
+    class Entity(models.TextChoices):
+        ENROLLMENT = 'enrollment', 'Enrollment'
+        GRADE = 'grade', 'Grade'
+
+    class Action(models.TextChoices):
+        CREATE = 'create', 'Create'
+        UPDATE = 'update', 'Update'
+        DELETE = 'delete', 'Delete'
+
+    entity = models.CharField(max_length=20, choices=Entity.choices)
+    action = models.CharField(max_length=10, choices=Action.choices)
+    object_id = models.BigIntegerField()
+    course_id = models.BigIntegerField(null=True)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.pk} {self.entity} {self.object_id} {self.action}"
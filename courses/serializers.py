@@ -14,7 +14,7 @@ class StudentSerializer(serializers.ModelSerializer):
 class CourseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = '__all__'
+        exclude = ['version']
 
 class EnrollmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -25,8 +25,8 @@ class EnrollmentSerializer(serializers.ModelSerializer):
 class GradeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Grade
-        fields = ['id', 'enrollment', 'grade', 'graded_by', 'updated_at']
-        read_only_fields = ['graded_by', 'updated_at']
+        fields = ['id', 'enrollment', 'grade', 'graded_by', 'updated_at', 'finalized_at']
+        read_only_fields = ['graded_by', 'updated_at', 'finalized_at']
 
 class GradeAuditSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache_versions import bump_course_version, bump_course_versions, next_version
+from .enrollment_index import enrollment_index
+from .models import Course, Enrollment, Grade, ChangeLogEntry, Student
+
+
+def _course_id_for(instance):
+    if isinstance(instance, Course):
+        return instance.pk
+    if isinstance(instance, Enrollment):
+        return instance.course_id
+    if Grade.enrollment.is_cached(instance):
+        return instance.enrollment.course_id
+    return Enrollment.objects.filter(pk=instance.enrollment_id).values_list('course_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    instance.version = next_version(instance.version)
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_enrollment(sender, instance, **kwargs):
+    # An update can move the seat to another student or course; keep the pair
+    # it replaces for the change log, the index and the old course's version.
+    instance._previous = None
+    if not instance._state.adding:
+        instance._previous = Enrollment.objects.filter(pk=instance.pk).values('student', 'course').first()
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+@receiver([post_save, post_delete], sender=Grade)
+def course_data_changed(sender, instance, signal, **kwargs):
+    # Bumped inside the writer's transaction, so the new stamp becomes
+    # visible together with the rows it covers.
+    course_id = _course_id_for(instance)
+    previous = getattr(instance, '_previous', None) if signal is post_save else None
+    if previous and previous['course'] != course_id:
+        bump_course_versions([course_id, previous['course']])
+    elif course_id is not None:
+        bump_course_version(course_id)
+
+
+@receiver(post_save, sender=Student)
+@receiver(pre_delete, sender=Student)
+def student_changed(sender, instance, **kwargs):
+    # Rosters show the student's name, email and id. Runs before a delete
+    # cascades to the enrollments.
+    bump_course_versions(Enrollment.objects.filter(student=instance).values('course_id'))
+
+
+def _change_payload(instance):
+    if isinstance(instance, Enrollment):
+        return {
+            'student': instance.student_id,
+            'course': instance.course_id,
+            'enrolled_at': instance.enrolled_at.isoformat() if instance.enrolled_at else None,
+        }
+    return {
+        'enrollment': instance.enrollment_id,
+        'grade': str(Decimal(str(instance.grade)).quantize(Decimal('0.01'))),
+        'graded_by': instance.graded_by_id,
+        'updated_at': instance.updated_at.isoformat() if instance.updated_at else None,
+        'finalized_at': instance.finalized_at.isoformat() if instance.finalized_at else None,
+    }
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+@receiver([post_save, post_delete], sender=Grade)
+def record_change(sender, instance, signal, created=False, **kwargs):
+    # Runs inside the writer's transaction, so the entry commits or rolls
+    # back together with the change it describes.
+    if signal is post_delete:
+        action = ChangeLogEntry.Action.DELETE
+    elif created:
+        action = ChangeLogEntry.Action.CREATE
+    else:
+        action = ChangeLogEntry.Action.UPDATE
+    payload = _change_payload(instance)
+    if sender is Enrollment and action == ChangeLogEntry.Action.UPDATE:
+        payload['previous'] = instance._previous
+    ChangeLogEntry.objects.create(
+        entity=ChangeLogEntry.Entity.ENROLLMENT if sender is Enrollment else ChangeLogEntry.Entity.GRADE,
+        action=action,
+        object_id=instance.pk,
+        course_id=_course_id_for(instance),
+        payload=payload,
+    )
+
+
+@receiver(post_save, sender=Enrollment)
+def index_enrollment(sender, instance, created, **kwargs):
+    course_id, student_id = instance.course_id, instance.student_id
+    previous = None if created else instance._previous
+
+    def apply():
+        if previous:
+            enrollment_index.remove(previous['course'], previous['student'])
+        enrollment_index.add(course_id, student_id)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Enrollment)
+def unindex_enrollment(sender, instance, **kwargs):
+    course_id, student_id = instance.course_id, instance.student_id
+    transaction.on_commit(lambda: enrollment_index.remove(course_id, student_id))
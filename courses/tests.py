@@ -1,14 +1,66 @@
-from django.test import TestCase
-from django.urls import reverse
-from rest_framework.test import APIClient
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import Course, Student, Enrollment, Grade, GradeAudit
+from .models import Course, Student, Enrollment, Grade, GradeAudit, ChangeLogEntry
+from . import dashboard, idempotency
+from .change_feed import read_changes
+from .cache_versions import bump_course_version
+from .enrollment_index import enrollment_index
+from .frontend_views import submit_grade_api
+from .serializers import GradeSerializer
+from .views import GradeViewSet
 
 User = get_user_model()
 
-class CourseTests(TestCase):
+
+@override_settings(ADMISSION_CONTROL={**settings.ADMISSION_CONTROL, 'ENABLED': False})
+class UMSTestCase(TestCase):
+    """
+    Admission control is off: its buckets live in a SQLite file that outlives
+    the test database. AdmissionControlTests turns it back on against a
+    temporary store.
+    """
+
+    def setUp(self):
+        enrollment_index.clear()
+
+    def make_professor(self, username='prof'):
+        return User.objects.create_user(username, f'{username}@example.com', 'pass', role=User.Role.PROFESSOR)
+
+    def make_course(self, code='CS101', **fields):
+        return Course.objects.create(**{'name': code, 'code': code, 'capacity': 10, **fields})
+
+    def make_students(self, count):
+        return [Student.objects.create(name=f"S{i}", email=f"s{i}@e.com", student_id=f"S{i}") for i in range(count)]
+
+    def make_tmpdir(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        return tmpdir.name
+
+
+class CourseTests(UMSTestCase):
     def setUp(self):
+        super().setUp()
         self.client = APIClient()
         self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
         self.professor = User.objects.create_user('prof', 'prof@example.com', 'pass', role=User.Role.PROFESSOR)
@@ -111,3 +163,606 @@ class CourseTests(TestCase):
         url_detail = reverse('course-detail', args=[self.course.id])
         response = self.client.get(url_detail)
         self.assertEqual(response.status_code, status.HTTP_200_OK, f"Failed to render course-detail: {response.content}")
+
+class AdminChangelistQueryTests(UMSTestCase):
+    # session, user, paginator count, result page, date hierarchy bounds + buckets
+    CHANGELIST_QUERIES = 6
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.admin)
+
+    def _populate(self, count):
+        course = Course.objects.create(name=f"Course {count}", code=f"C{count}", capacity=400)
+        for i in range(count):
+            student = Student.objects.create(name=f"S{count}-{i}", email=f"s{count}-{i}@e.com", student_id=f"S{count}-{i}")
+            enrollment = Enrollment.objects.create(student=student, course=course)
+            grade = Grade.objects.create(enrollment=enrollment, grade=80, graded_by=self.admin)
+            GradeAudit.objects.create(grade_obj=grade, new_grade=80, changed_by=self.admin)
+
+    def _assert_fixed_queries(self, url_name):
+        url = reverse(url_name)
+        for rows in (2, 30):
+            self._populate(rows)
+            with self.assertNumQueries(self.CHANGELIST_QUERIES):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_enrollment_changelist_query_count(self):
+        self._assert_fixed_queries('admin:courses_enrollment_changelist')
+
+    def test_grade_changelist_query_count(self):
+        self._assert_fixed_queries('admin:courses_grade_changelist')
+
+    def test_gradeaudit_changelist_query_count(self):
+        self._assert_fixed_queries('admin:courses_gradeaudit_changelist')
+
+
+class WorkerRoleImportTests(SimpleTestCase):
+    def _loaded_modules(self, role, modules):
+        code = (
+            "import sys, django; django.setup(); "
+            "from django.urls import get_resolver; get_resolver().url_patterns; "
+            f"print(' '.join(m for m in {modules!r} if m in sys.modules))"
+        )
+        env = dict(os.environ, UMS_WORKER_ROLE=role, DJANGO_SETTINGS_MODULE='ums.settings')
+        proc = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+                              capture_output=True, text=True, check=True)
+        return proc.stdout.split()
+
+    def test_api_worker_skips_frontend_views(self):
+        loaded = self._loaded_modules('api', ['courses.views', 'courses.frontend_views'])
+        self.assertEqual(loaded, ['courses.views'])
+
+    def test_frontend_worker_skips_drf_views(self):
+        loaded = self._loaded_modules('frontend', ['courses.frontend_views', 'courses.views', 'rest_framework.routers'])
+        self.assertEqual(loaded, ['courses.frontend_views'])
+
+    def test_grade_form_endpoint_is_served_by_frontend_workers(self):
+        for urlconf in ('ums.urls', 'ums.urls_frontend'):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                self.assertIs(resolve('/api/grades/submit/').func, submit_grade_api)
+
+
+@override_settings(DASHBOARD_SNAPSHOT_BACKGROUND_REFRESH=False)
+class DashboardSnapshotTests(UMSTestCase):
+    def setUp(self):
+        cache.clear()
+        self.professor = User.objects.create_user('prof', 'prof@example.com', 'pass', role=User.Role.PROFESSOR)
+        self.course = Course.objects.create(name="CS101", code="CS101", capacity=10)
+        self.student = Student.objects.create(name="John Doe", email="john@example.com", student_id="S123")
+        self.client.force_login(self.professor)
+
+    def test_warm_dashboard_is_single_cache_read(self):
+        for i in range(5):
+            Course.objects.create(name=f"Course {i}", code=f"C{i}", capacity=10)
+        url = reverse('professor-dashboard')
+        self.client.get(url)
+        # Session and user lookups, one cache read for the snapshot and one
+        # aggregate over the courses table, however many courses there are;
+        # no Enrollment or Grade queries.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, "0 / 10 Students", count=6)
+
+    def test_changes_serve_stale_then_refresh(self):
+        self.assertEqual(dashboard.get_course_cards()[0]['seat_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        # The first read after a change still answers from the old snapshot...
+        self.assertEqual(dashboard.get_course_cards()[0]['seat_count'], 0)
+        # ...and the refresh it triggered is visible on the next one.
+        card = dashboard.get_course_cards()[0]
+        self.assertEqual((card['seat_count'], card['graded_count']), (1, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.create(enrollment=enrollment, grade=90, graded_by=self.professor)
+        dashboard.get_course_cards()
+        self.assertEqual(dashboard.get_course_cards()[0]['graded_count'], 1)
+
+    def test_synchronous_refresh_keeps_the_request_connection(self):
+        dashboard.get_course_cards()
+        bump_course_version(self.course.id)
+        with mock.patch.object(connection, 'close') as close:
+            dashboard.get_course_cards()
+        close.assert_not_called()
+
+
+@override_settings(ENROLLMENT_INDEX_MAX_STALENESS=60)
+class CourseFragmentCacheTests(UMSTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.professor = User.objects.create_user('prof', 'prof@example.com', 'pass', role=User.Role.PROFESSOR)
+        self.course = Course.objects.create(name="CS101", code="CS101", capacity=10)
+        self.student = Student.objects.create(name="John Doe", email="john@example.com", student_id="S123")
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_login(self.professor)
+        self.url = reverse('course-detail', args=[self.course.id])
+
+    def test_roster_is_cached_until_grade_changes(self):
+        self.client.get(self.url)
+        # Warm: session, user, course (which carries the version stamp), the
+        # eligible-student dropdown and one cache read per fragment; no
+        # roster query.
+        with self.assertNumQueries(6):
+            self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.create(enrollment=self.enrollment, grade=88, graded_by=self.professor)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'value="88.00"')
+
+    def test_roster_is_invalidated_by_enrollment(self):
+        self.client.get(self.url)
+        other = Student.objects.create(name="Jane Roe", email="jane@example.com", student_id="S124")
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=other, course=self.course)
+        response = self.client.get(self.url)
+        self.assertContains(response, "<td>Jane Roe</td>", html=True)
+        self.assertContains(response, "Capacity: 2 / 10")
+
+    def test_writes_do_not_touch_the_cache(self):
+        other = Student.objects.create(name="Jane Roe", email="jane@example.com", student_id="S124")
+        client = APIClient()
+        client.force_authenticate(user=self.professor)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('enroll-student'), {'student': other.id, 'course': self.course.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([q['sql'] for q in queries if 'ums_cache' in q['sql']])
+
+    def test_roster_is_invalidated_by_student_edit(self):
+        self.client.get(self.url)
+        self.student.name = "John Q. Doe"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "<td>John Q. Doe</td>", html=True)
+
+
+class IdempotencyKeyTests(UMSTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.professor = User.objects.create_user('prof', 'prof@example.com', 'pass', role=User.Role.PROFESSOR)
+        self.student_record = Student.objects.create(name="John Doe", email="john@example.com", student_id="S123")
+        self.course = Course.objects.create(name="CS101", code="CS101", capacity=10)
+
+    def test_enrollment_retry_is_replayed(self):
+        self.client.force_authenticate(user=self.professor)
+        url = reverse('enroll-student')
+        data = {'student': self.student_record.id, 'course': self.course.id}
+        first = self.client.post(url, data, HTTP_IDEMPOTENCY_KEY='enroll-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        # Answered from the store: one cache read, no course lock, no
+        # duplicate check.
+        with self.assertNumQueries(1):
+            retry = self.client.post(url, data, HTTP_IDEMPOTENCY_KEY='enroll-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+    def test_key_reused_for_different_request(self):
+        self.client.force_authenticate(user=self.professor)
+        url = reverse('enroll-student')
+        self.client.post(url, {'student': self.student_record.id, 'course': self.course.id}, HTTP_IDEMPOTENCY_KEY='k')
+        other = Course.objects.create(name="CS102", code="CS102", capacity=10)
+        response = self.client.post(url, {'student': self.student_record.id, 'course': other.id}, HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+    def test_grade_retry_writes_one_audit(self):
+        enrollment = Enrollment.objects.create(student=self.student_record, course=self.course)
+        self.client.force_login(self.professor)
+        url = reverse('submit-grade-api')
+        body = {'enrollment': enrollment.id, 'grade': 77}
+        for _ in range(3):
+            response = self.client.post(url, body, format='json', HTTP_IDEMPOTENCY_KEY='grade-1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(GradeAudit.objects.filter(grade_obj__enrollment=enrollment).count(), 1)
+
+        # A new key is a new write.
+        self.client.post(url, body, format='json', HTTP_IDEMPOTENCY_KEY='grade-2')
+        self.assertEqual(GradeAudit.objects.filter(grade_obj__enrollment=enrollment).count(), 2)
+
+    def test_retry_racing_the_original_is_replayed(self):
+        self.client.force_authenticate(user=self.professor)
+        url = reverse('enroll-student')
+        data = {'student': self.student_record.id, 'course': self.course.id}
+        self.client.post(url, data, HTTP_IDEMPOTENCY_KEY='enroll-1')
+
+        # The retry's first look misses: the original stored its response
+        # and released the lock just after.
+        store = idempotency._store()
+        get = store.get
+        misses = iter([None])
+        with mock.patch.object(store, 'get', side_effect=lambda *args: next(misses, get(*args))):
+            retry = self.client.post(url, data, HTTP_IDEMPOTENCY_KEY='enroll-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+    @override_settings(
+        CACHES={'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        IDEMPOTENCY_CACHE='local',
+    )
+    def test_process_local_store_is_refused(self):
+        self.client.force_authenticate(user=self.professor)
+        data = {'student': self.student_record.id, 'course': self.course.id}
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.post(reverse('enroll-student'), data, HTTP_IDEMPOTENCY_KEY='enroll-1')
+        self.assertEqual(Enrollment.objects.count(), 0)
+
+
+class ChangeFeedTests(UMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.professor = self.make_professor()
+        self.course = self.make_course()
+        self.students = self.make_students(3)
+        self.client.force_authenticate(user=self.professor)
+        self.url = reverse('change-feed')
+
+    def _changes(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_feed_follows_enrollment_and_grade_writes(self):
+        self.client.post(reverse('enroll-student'), {'student': self.students[0].id, 'course': self.course.id})
+        enrollment = Enrollment.objects.get()
+        grade_url = reverse('grade-list')
+        grade_id = self.client.post(grade_url, {'enrollment': enrollment.id, 'grade': 70}).data['id']
+        self.client.put(reverse('grade-detail', args=[grade_id]), {'enrollment': enrollment.id, 'grade': 75})
+
+        first = self._changes(since=0, limit=2)
+        self.assertEqual(
+            [(c['entity'], c['action']) for c in first['changes']],
+            [('enrollment', 'create'), ('grade', 'create')],
+        )
+        self.assertTrue(first['has_more'])
+
+        rest = self._changes(since=first['next_cursor'])
+        self.assertEqual(len(rest['changes']), 1)
+        change = rest['changes'][0]
+        self.assertEqual((change['entity'], change['action'], change['course']), ('grade', 'update', self.course.id))
+        self.assertEqual(change['data']['grade'], '75.00')
+        self.assertFalse(rest['has_more'])
+
+        enrollment_id = enrollment.id
+        enrollment.delete()
+        tail = self._changes(since=rest['next_cursor'])
+        self.assertEqual(
+            [(c['entity'], c['action'], c['id']) for c in tail['changes']],
+            [('grade', 'delete', grade_id), ('enrollment', 'delete', enrollment_id)],
+        )
+
+    def test_batch_stops_at_recent_sequence_gap(self):
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+        first, missing, last = ChangeLogEntry.objects.values_list('pk', flat=True)
+        # Stand-in for a lower sequence number that has not committed yet.
+        ChangeLogEntry.objects.filter(pk=missing).delete()
+
+        entries, cursor, has_more = read_changes(0)
+        self.assertEqual(([e.pk for e in entries], cursor, has_more), ([first], first, True))
+        with override_settings(CHANGE_FEED_GAP_GRACE_SECONDS=-1):
+            entries, cursor, has_more = read_changes(0)
+        self.assertEqual(([e.pk for e in entries], cursor, has_more), ([first, last], last, False))
+
+    def test_fresh_consumer_waits_for_lower_entries(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        Enrollment.objects.create(student=self.students[1], course=self.course)
+        first, second = ChangeLogEntry.objects.values_list('pk', flat=True)
+        # Stand-in for the log's first entry still committing.
+        ChangeLogEntry.objects.filter(pk=first).delete()
+
+        self.assertEqual(read_changes(0), ([], 0, True))
+        with override_settings(CHANGE_FEED_GAP_GRACE_SECONDS=-1):
+            entries, cursor, has_more = read_changes(0)
+        self.assertEqual(([e.pk for e in entries], cursor, has_more), ([second], second, False))
+
+    def test_rolled_back_write_leaves_no_entry(self):
+        try:
+            with transaction.atomic():
+                Enrollment.objects.create(student=self.students[0], course=self.course)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self._changes(since=0)['changes'], [])
+
+    def test_feed_requires_staff_or_professor(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(CHANGE_FEED_STREAM_SECONDS=0.01, CHANGE_FEED_POLL_SECONDS=0)
+    def test_event_stream_resumes_from_last_event_id(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        second = Enrollment.objects.create(student=self.students[1], course=self.course)
+        first_seq = self._changes(since=0)['changes'][0]['seq']
+
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID=str(first_seq))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertNotIn(f'id: {first_seq}\n', body)
+        self.assertIn(f'"id": {second.id}', body)
+
+
+class AdmissionControlTests(UMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store_path = os.path.join(self.make_tmpdir(), 'admission.sqlite3')
+        self.client = APIClient()
+        self.professor = self.make_professor()
+        self.course = self.make_course(capacity=50)
+        self.students = self.make_students(4)
+        self.client.force_authenticate(user=self.professor)
+        self.url = reverse('enroll-student')
+
+    def _limits(self, **overrides):
+        config = {
+            'ENABLED': True,
+            'STORE_OPTIONS': {'path': self.store_path},
+            'USER_RATE': (100, 100),
+            'COURSE_RATE': (100, 100),
+            'MAX_CONCURRENT_WRITES': 4,
+        }
+        config.update(overrides)
+        return override_settings(ADMISSION_CONTROL=config)
+
+    def _enroll(self, student):
+        return self.client.post(self.url, {'student': student.id, 'course': self.course.id})
+
+    def test_user_bucket_rejects_with_retry_after(self):
+        with self._limits(USER_RATE=(0.1, 2)):
+            self.assertEqual(self._enroll(self.students[0]).status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self._enroll(self.students[1]).status_code, status.HTTP_201_CREATED)
+            response = self._enroll(self.students[2])
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(Enrollment.objects.count(), 2)
+
+    def test_course_bucket_is_shared_across_users(self):
+        other = self.make_professor('prof2')
+        with self._limits(COURSE_RATE=(1, 1)):
+            self.assertEqual(self._enroll(self.students[0]).status_code, status.HTTP_201_CREATED)
+            self.client.force_authenticate(user=other)
+            self.assertEqual(self._enroll(self.students[1]).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_concurrency_slots_are_released(self):
+        with self._limits(MAX_CONCURRENT_WRITES=1):
+            for student in self.students:
+                self.assertEqual(self._enroll(student).status_code, status.HTTP_201_CREATED)
+        with self._limits(MAX_CONCURRENT_WRITES=0):
+            response = self._enroll(self.students[0])
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_busy_store_turns_requests_away(self):
+        with self._limits(STORE_OPTIONS={'path': self.store_path, 'timeout': 0.05}):
+            self.assertEqual(self._enroll(self.students[0]).status_code, status.HTTP_201_CREATED)
+            # Another worker holding the store's write lock.
+            blocker = sqlite3.connect(self.store_path, isolation_level=None)
+            blocker.execute('BEGIN IMMEDIATE')
+            try:
+                with self.assertLogs('courses.admission', 'WARNING'):
+                    response = self._enroll(self.students[1])
+            finally:
+                blocker.execute('ROLLBACK')
+                blocker.close()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+    def test_course_bucket_ignores_non_integer_ids(self):
+        with self._limits(COURSE_RATE=(0.1, 1)):
+            for _ in range(2):
+                response = self.client.post(self.url, {'student': self.students[0].id, 'course': 'abc'})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejected_request_is_not_replayed(self):
+        data = {'student': self.students[0].id, 'course': self.course.id}
+        with self._limits(MAX_CONCURRENT_WRITES=0):
+            response = self.client.post(self.url, data, HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # Retrying after Retry-After with the same key runs the write.
+        with self._limits():
+            retry = self.client.post(self.url, data, HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', retry)
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+
+class EnrollmentIndexTests(UMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.professor = self.make_professor()
+        self.course = self.make_course(capacity=2)
+        self.students = self.make_students(3)
+        self.client.force_authenticate(user=self.professor)
+
+    def _enroll_elsewhere(self, student):
+        # Committed by another worker: no local on_commit, only the change log.
+        return Enrollment.objects.create(student=student, course=self.course)
+
+    @override_settings(ENROLLMENT_INDEX_MAX_STALENESS=60)
+    def test_warm_lookups_skip_the_database(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.students[0], course=self.course)
+        enrollment_index.seat_count(self.course.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(enrollment_index.is_enrolled(self.course.id, self.students[0].id))
+            self.assertFalse(enrollment_index.is_enrolled(self.course.id, self.students[1].id))
+            self.assertEqual(enrollment_index.seat_count(self.course.id), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.get(student=self.students[0]).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(enrollment_index.student_ids(self.course.id), [])
+
+    @override_settings(ENROLLMENT_INDEX_MAX_STALENESS=0)
+    def test_other_workers_changes_arrive_through_change_log(self):
+        self.assertEqual(enrollment_index.seat_count(self.course.id), 0)
+        enrollment = self._enroll_elsewhere(self.students[1])
+        self.assertEqual(enrollment_index.student_ids(self.course.id), [self.students[1].id])
+        enrollment.delete()
+        self.assertEqual(enrollment_index.seat_count(self.course.id), 0)
+
+    @override_settings(ENROLLMENT_INDEX_MAX_STALENESS=60)
+    def test_duplicate_is_rejected_before_the_lock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.students[0], course=self.course)
+        enrollment_index.seat_count(self.course.id)
+        # Confirmed by one lookup; no row lock, no COUNT.
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('enroll-student'), {'student': self.students[0].id, 'course': self.course.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('already enrolled', str(response.data))
+
+    @override_settings(ENROLLMENT_INDEX_MAX_STALENESS=60)
+    def test_full_course_is_counted_under_the_lock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for student in self.students[:2]:
+                Enrollment.objects.create(student=student, course=self.course)
+        enrollment_index.seat_count(self.course.id)
+        # Another worker frees a seat; this index still counts it.
+        Enrollment.objects.filter(student=self.students[0]).delete()
+        self.assertEqual(enrollment_index.seat_count(self.course.id), 2)
+
+        response = self.client.post(reverse('enroll-student'), {'student': self.students[2].id, 'course': self.course.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('enroll-student'), {'student': self.students[0].id, 'course': self.course.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Course is full', str(response.data))
+
+    def test_moved_enrollment_leaves_no_phantom_seat(self):
+        other = self.make_course('CS102', capacity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(student=self.students[0], course=self.course)
+        self.assertEqual(enrollment_index.seat_count(self.course.id), 1)
+        self.assertEqual(enrollment_index.seat_count(other.id), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.course = other
+            enrollment.student = self.students[1]
+            enrollment.save()
+        with override_settings(ENROLLMENT_INDEX_MAX_STALENESS=60):
+            self.assertEqual(enrollment_index.student_ids(self.course.id), [])
+            self.assertEqual(enrollment_index.student_ids(other.id), [self.students[1].id])
+
+        # Another worker replays the move from the change log.
+        enrollment_index.clear()
+        enrollment_index.seat_count(self.course.id)
+        enrollment_index.seat_count(other.id)
+        with override_settings(ENROLLMENT_INDEX_MAX_STALENESS=0):
+            enrollment.course = self.course
+            enrollment.save()
+            self.assertEqual(enrollment_index.student_ids(self.course.id), [self.students[1].id])
+            self.assertEqual(enrollment_index.student_ids(other.id), [])
+
+        entry = ChangeLogEntry.objects.filter(action=ChangeLogEntry.Action.UPDATE).last()
+        self.assertEqual(entry.payload['previous'], {'student': self.students[1].id, 'course': other.id})
+
+    @override_settings(ENROLLMENT_INDEX_MAX_STALENESS=60)
+    def test_unique_constraint_catches_stale_index(self):
+        enrollment_index.seat_count(self.course.id)
+        self._enroll_elsewhere(self.students[0])
+        self.assertFalse(enrollment_index.is_enrolled(self.course.id, self.students[0].id))
+
+        response = self.client.post(reverse('enroll-student'), {'student': self.students[0].id, 'course': self.course.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('already enrolled', str(response.data))
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+
+class FinalizeTermTests(UMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output_dir = self.make_tmpdir()
+        self.professor = self.make_professor()
+        self.courses = [self.make_course(f"C{i}", name=f"Course {i}") for i in range(3)]
+        self.students = self.make_students(2)
+        for course in self.courses:
+            for student in self.students:
+                enrollment = Enrollment.objects.create(student=student, course=course)
+                Grade.objects.create(enrollment=enrollment, grade=80, graded_by=self.professor)
+
+    def _finalize(self):
+        out = StringIO()
+        call_command('finalize_term', 'fall', output_dir=self.output_dir, workers=0, shard_size=2,
+                     user='prof', stdout=out)
+        return out.getvalue()
+
+    def test_incomplete_course_blocks_only_its_shard_and_rerun_finishes(self):
+        ungraded = Grade.objects.filter(enrollment__course=self.courses[2]).first()
+        ungraded.delete()
+
+        with self.assertRaises(CommandError):
+            self._finalize()
+        self.assertEqual(Grade.objects.filter(finalized_at__isnull=False).count(), 4)
+        self.assertFalse(Grade.objects.filter(enrollment__course=self.courses[2], finalized_at__isnull=False).exists())
+
+        Grade.objects.create(enrollment=ungraded.enrollment, grade=70, graded_by=self.professor)
+        output = self._finalize()
+        self.assertIn("2 shards, 1 already done, 1 to run.", output)
+        self.assertEqual(Grade.objects.filter(finalized_at__isnull=True).count(), 0)
+        # One final audit per grade, none repeated by the rerun.
+        self.assertEqual(GradeAudit.objects.filter(changed_by=self.professor).count(), 6)
+
+        summary = json.loads((Path(self.output_dir) / 'summary.json').read_text())
+        self.assertEqual([c['status'] for c in summary['courses']], ['finalized'] * 3)
+        report = Path(self.output_dir) / 'courses' / f'{self.courses[0].pk}-c0.csv'
+        self.assertEqual(report.read_text().splitlines(), ['student_id,name,grade', 'S0,S0,80.00', 'S1,S1,80.00'])
+
+    def test_finalized_grades_reject_changes(self):
+        self._finalize()
+        grade = Grade.objects.first()
+        client = APIClient()
+        client.force_authenticate(user=self.professor)
+        response = client.put(reverse('grade-detail', args=[grade.id]), {'enrollment': grade.enrollment_id, 'grade': 99})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        client.force_login(self.professor)
+        response = client.post(reverse('submit-grade-api'), {'enrollment': grade.enrollment_id, 'grade': 99}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        grade.refresh_from_db()
+        self.assertEqual(grade.grade, 80)
+
+    def test_admin_cannot_change_finalized_grade(self):
+        self._finalize()
+        grade = Grade.objects.first()
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin_user)
+        url = reverse('admin:courses_grade_change', args=[grade.id])
+        self.client.post(url, {
+            'enrollment': grade.enrollment_id, 'grade': 99, 'graded_by': self.professor.id, 'finalized_at': '',
+        })
+        grade.refresh_from_db()
+        self.assertEqual(grade.grade, 80)
+        self.assertIsNotNone(grade.finalized_at)
+        response = self.client.get(reverse('admin:courses_grade_delete', args=[grade.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_update_checks_finalized_at_after_locking(self):
+        # An update that loaded the grade just before finalization committed.
+        stale = Grade.objects.first()
+        self._finalize()
+        view = GradeViewSet()
+        view.request = APIRequestFactory().put('/')
+        view.request.user = self.professor
+        serializer = GradeSerializer(stale, data={'grade': 99}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(ValidationError):
+            view.perform_update(serializer)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.grade, 80)
+        self.assertIsNotNone(stale.finalized_at)
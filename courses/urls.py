@@ -2,10 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     StudentViewSet, CourseViewSet, EnrollmentViewSet, GradeViewSet,
-    ProfessorLoginView, ProfessorDashboardView, StudentCreateView, CourseDetailView,
-    enroll_student_view, submit_grade_api
+    ChangeFeedView
 )
-from django.contrib.auth.views import LogoutView
 
 router = DefaultRouter()
 router.register(r'students', StudentViewSet)
@@ -13,8 +11,7 @@ router.register(r'courses', CourseViewSet)
 router.register(r'grades', GradeViewSet)
 
 urlpatterns = [
-    path('grades/submit/', submit_grade_api, name='submit-grade-api'),
+    path('changes/', ChangeFeedView.as_view(), name='change-feed'),
     path('', include(router.urls)),
     path('enroll/', EnrollmentViewSet.as_view({'post': 'create'}), name='enroll-student'),
 ]
-
@@ -1,8 +1,17 @@
-from rest_framework import viewsets, status, generics, permissions
+import json
+from django.conf import settings
+from rest_framework import viewsets, status, permissions, renderers, serializers
+from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import action
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from .admission import admission_controlled
+from .change_feed import read_changes, serialize_entry, stream_changes, DEFAULT_BATCH_SIZE
+from .enrollment_index import enrollment_index
+from .finalization import is_finalized, lock_for_grading
+from .idempotency import idempotent
 from .models import Student, Course, Enrollment, Grade, GradeAudit, User
 from .serializers import StudentSerializer, CourseSerializer, EnrollmentSerializer, GradeSerializer, GradeAuditSerializer
 
@@ -29,6 +38,8 @@ class CourseViewSet(viewsets.ModelViewSet):
 class EnrollmentViewSet(viewsets.ViewSet):
     permission_classes = [IsProfessor]
 
+    @method_decorator(idempotent)
+    @method_decorator(admission_controlled(course_id=lambda request: request.data.get('course')))
     def create(self, request):
         student_id = request.data.get('student')
         course_id = request.data.get('course')
@@ -37,6 +48,12 @@ class EnrollmentViewSet(viewsets.ViewSet):
             return Response({'error': 'Student and Course are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
+            # Turn away duplicates before queuing on the course lock. The index
+            # only says who to check; "full" is only decided by the COUNT below.
+            if (enrollment_index.is_enrolled(course_id, int(student_id))
+                    and Enrollment.objects.filter(course_id=course_id, student_id=student_id).exists()):
+                return Response({'error': 'Student already enrolled.'}, status=status.HTTP_400_BAD_REQUEST)
+
             with transaction.atomic():
  
                 course = Course.objects.select_for_update().get(pk=course_id)
@@ -46,11 +63,13 @@ class EnrollmentViewSet(viewsets.ViewSet):
                 
                 student = get_object_or_404(Student, pk=student_id)
                 
-                # Check if already enrolled
-                if Enrollment.objects.filter(student=student, course=course).exists():
-                     return Response({'error': 'Student already enrolled.'}, status=status.HTTP_400_BAD_REQUEST)
+                # The unique constraint decides duplicates the index missed
+                try:
+                    with transaction.atomic():
+                        enrollment = Enrollment.objects.create(student=student, course=course)
+                except IntegrityError:
+                    return Response({'error': 'Student already enrolled.'}, status=status.HTTP_400_BAD_REQUEST)
 
-                enrollment = Enrollment.objects.create(student=student, course=course)
                 serializer = EnrollmentSerializer(enrollment)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -64,6 +83,7 @@ class GradeViewSet(viewsets.ModelViewSet):
     serializer_class = GradeSerializer
     permission_classes = [IsProfessorOrAdmin]
 
+    @transaction.atomic
     def perform_create(self, serializer):
         # Create Grade
         grade = serializer.save(graded_by=self.request.user)
@@ -74,8 +94,12 @@ class GradeViewSet(viewsets.ModelViewSet):
             changed_by=self.request.user
         )
 
+    @transaction.atomic
     def perform_update(self, serializer):
         instance = serializer.instance
+        lock_for_grading(instance.enrollment)
+        if is_finalized(instance):
+            raise serializers.ValidationError({'grade': 'Grade has been finalized.'})
         previous_grade = instance.grade
         
         # Update Grade
@@ -89,137 +113,56 @@ class GradeViewSet(viewsets.ModelViewSet):
             changed_by=self.request.user
         )
 
-# --- Frontend Views ---
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        lock_for_grading(instance.enrollment)
+        if is_finalized(instance):
+            raise serializers.ValidationError({'grade': 'Grade has been finalized.'})
+        instance.delete()
 
-from django.contrib.auth.views import LoginView
-from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.shortcuts import redirect
-from django.contrib import messages
-import json
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
-from django.views.decorators.csrf import csrf_exempt
-
-class ProfessorLoginView(LoginView):
-    template_name = 'courses/login.html'
-    redirect_authenticated_user = True
-    
-    def get_success_url(self):
-        return reverse_lazy('professor-dashboard')
-
-class ProfessorDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
-    model = Course
-    template_name = 'courses/dashboard.html'
-    context_object_name = 'courses'
-
-    def test_func(self):
-        return self.request.user.role == User.Role.PROFESSOR or self.request.user.is_superuser
-
-    def get_queryset(self):
-        # Using select_related/prefetch_related for optimization
-        # Since Enrollment is not directly on Course but via Reverse relation
-        return Course.objects.all().prefetch_related('enrollments')
-
-class StudentCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
-    model = Student
-    fields = ['name', 'email', 'student_id']
-    template_name = 'courses/student_form.html'
-    success_url = reverse_lazy('professor-dashboard')
-
-    def test_func(self):
-        return self.request.user.role == User.Role.PROFESSOR or self.request.user.is_superuser
-
-    def form_valid(self, form):
-        messages.success(self.request, "Student created successfully.")
-        return super().form_valid(form)
-
-class CourseDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
-    model = Course
-    template_name = 'courses/course_detail.html'
-
-    def test_func(self):
-        return self.request.user.role == User.Role.PROFESSOR or self.request.user.is_superuser
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['enrollments'] = self.object.enrollments.select_related('student', 'grade').all()
-        # For the dropdown
-        # Exclude already enrolled students could be a nice touch, but simple all() for now
-        context['all_students'] = Student.objects.exclude(enrollments__course=self.object)
-        return context
-
-@require_POST
-def enroll_student_view(request, course_id):
-    if not request.user.is_authenticated or request.user.role != User.Role.PROFESSOR:
-        messages.error(request, "Unauthorized")
-        return redirect('professor-dashboard')
-
-    student_id = request.POST.get('student_id')
-    course = get_object_or_404(Course, pk=course_id)
-    student = get_object_or_404(Student, pk=student_id)
-
-    try:
-        with transaction.atomic():
-            course_lock = Course.objects.select_for_update().get(pk=course_id)
-            if course_lock.enrollments.count() >= course_lock.capacity:
-                messages.error(request, "Course is full.")
-            elif Enrollment.objects.filter(student=student, course=course).exists():
-                messages.error(request, "Student already enrolled.")
-            else:
-                Enrollment.objects.create(student=student, course=course)
-                messages.success(request, f"Enrolled {student.name} successfully.")
-    except Exception as e:
-        messages.error(request, f"Error: {e}")
-
-    return redirect('course-detail', pk=course_id)
-
-@require_POST
-def submit_grade_api(request):
+class EventStreamRenderer(renderers.BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only reached for errors; the stream itself bypasses rendering.
+        return f'event: error\ndata: {json.dumps(data)}\n\n'.encode()
+
+class ChangeFeedView(APIView):
     """
-    Helper API for the frontend JS to submit/update grades easily.
-    Expects JSON: { enrollment: id, grade: value }
+    Enrollment and grade changes after a cursor.
+
+    GET /api/changes/?since=<seq>&limit=<n> returns a batch and the cursor
+    to pass next. With ?stream=1 (or Accept: text/event-stream) the response
+    is a server-sent event stream that tails the log; it closes after
+    CHANGE_FEED_STREAM_SECONDS and clients resume with Last-Event-ID.
     """
-    if not request.user.is_authenticated or request.user.role != User.Role.PROFESSOR:
-        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    permission_classes = [IsProfessorOrAdmin]
+    renderer_classes = [renderers.JSONRenderer, renderers.BrowsableAPIRenderer, EventStreamRenderer]
 
-    try:
-        data = json.loads(request.body)
-        enrollment_id = data.get('enrollment')
-        grade_value = data.get('grade')
-        
-        enrollment = get_object_or_404(Enrollment, pk=enrollment_id)
-        
-        # Check if grade exists
-        grade_obj, created = Grade.objects.get_or_create(enrollment=enrollment, defaults={'grade': grade_value, 'graded_by': request.user})
-        
-        if not created:
-            # Update existing
-            previous_grade = grade_obj.grade
-            grade_obj.grade = grade_value
-            grade_obj.graded_by = request.user
-            grade_obj.save()
-            
-            # Audit manual check (signals or override save would affect this, but our ViewSet had the audit logic)
-            # Since we are modifying directly, we should manually invoke Audit or use a Service layer.
-            # Reuse the Logic from the ViewSet???
-            # Or just Quick create audit here.
-            GradeAudit.objects.create(
-                grade_obj=grade_obj,
-                previous_grade=previous_grade,
-                new_grade=grade_value,
-                changed_by=request.user
-            )
-        else:
-             # Audit for create
-             GradeAudit.objects.create(
-                grade_obj=grade_obj,
-                new_grade=grade_value,
-                changed_by=request.user
+    def get(self, request):
+        try:
+            since = int(request.headers.get('Last-Event-ID') or request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', DEFAULT_BATCH_SIZE))
+        except ValueError:
+            return Response({'error': 'since and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.query_params.get('stream') in ('1', 'true') or request.accepted_renderer.format == 'event-stream':
+            response = StreamingHttpResponse(
+                stream_changes(
+                    since,
+                    duration=getattr(settings, 'CHANGE_FEED_STREAM_SECONDS', 20),
+                    poll_interval=getattr(settings, 'CHANGE_FEED_POLL_SECONDS', 1.0),
+                ),
+                content_type='text/event-stream',
             )
-
-        return JsonResponse({'status': 'success'})
-    except Exception as e:
-         return JsonResponse({'error': str(e)}, status=400)
-
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        entries, next_cursor, has_more = read_changes(since, limit)
+        return Response({
+            'changes': [serialize_entry(entry) for entry in entries],
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        })
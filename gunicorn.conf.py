@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration.
+
+The application is loaded once in the master (preload_app) so forked workers
+share its imported modules copy-on-write, and a worker started by the
+autoscaler during a registration spike only has to fork, not re-import Django.
+Set UMS_WORKER_ROLE to "api" or "frontend" to boot a pool that serves one
+half of the site (see ROOT_URLCONF in ums/settings.py).
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'ums.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Change feed streams are cut off before this (CHANGE_FEED_STREAM_SECONDS).
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = True
+
+
+def when_ready(server):
+    # Resolve the URL conf in the master so the view modules are imported
+    # before forking rather than on each worker's first request.
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def pre_fork(server, worker):
+    # Never share a database connection opened in the master with a worker.
+    from django.db import connections
+    connections.close_all()
+    # Move everything imported so far out of the collector's reach; otherwise
+    # the first collection in each worker touches every object header and
+    # un-shares the pages preloading just saved.
+    gc.freeze()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,7 +54,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'ums.urls'
+# Workers can be booted for a single role so they only import the views they
+# serve: "api" (DRF endpoints), "frontend" (portal + admin) or "all".
+UMS_WORKER_ROLE = os.environ.get('UMS_WORKER_ROLE', 'all')
+
+ROOT_URLCONF = {
+    'api': 'ums.urls_api',
+    'frontend': 'ums.urls_frontend',
+}.get(UMS_WORKER_ROLE, 'ums.urls')
 
 TEMPLATES = [
     {
@@ -85,6 +93,49 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+#
+# Course fragments, the dashboard snapshot and idempotency keys must be seen
+# by every gunicorn worker, so a local-memory cache won't do. In production
+# set REDIS_URL. Without it both aliases fall back to database tables
+# (create them with `python manage.py createcachetable`), which is fine for
+# development but culls entries once MAX_ENTRIES is reached, idempotency keys
+# included.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'idempotency': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'idempotency',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'ums_cache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+            },
+        },
+        'idempotency': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'ums_idempotency',
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000000,
+            },
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -130,3 +181,44 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = 'professor-dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 LOGIN_URL = 'login'
+
+# Professor dashboard snapshot (courses/dashboard.py), kept in the shared
+# default cache so all workers serve and refresh the same snapshot.
+DASHBOARD_SNAPSHOT_FRESH_SECONDS = 30
+DASHBOARD_SNAPSHOT_TIMEOUT = 24 * 60 * 60
+DASHBOARD_SNAPSHOT_BACKGROUND_REFRESH = True
+
+# Idempotency-Key store for POST /api/enroll/ and /api/grades/submit/
+# (courses/idempotency.py). Must be a cache shared by all workers; a
+# local-memory alias is rejected at the first keyed request.
+IDEMPOTENCY_CACHE = 'idempotency'
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Change feed at /api/changes/ (courses/change_feed.py). Each open event
+# stream holds a worker, so streams are closed after CHANGE_FEED_STREAM_SECONDS
+# and clients reconnect with Last-Event-ID. Gunicorn's sync workers don't
+# heartbeat while streaming, so a stream must end well inside the worker
+# timeout (GUNICORN_TIMEOUT, see gunicorn.conf.py) or the worker is killed.
+# A writer that commits more than CHANGE_FEED_GAP_GRACE_SECONDS after writing
+# its entry is missed by consumers, so keep it above the worker timeout.
+CHANGE_FEED_GAP_GRACE_SECONDS = max(60, int(os.environ.get('GUNICORN_TIMEOUT', 30)) * 2)
+CHANGE_FEED_STREAM_SECONDS = max(5, int(os.environ.get('GUNICORN_TIMEOUT', 30)) - 10)
+CHANGE_FEED_POLL_SECONDS = 1.0
+
+# Admission control for enrollment and grade writes (courses/admission.py).
+# Rates are (tokens per second, burst). The SQLite store is shared by the
+# workers on one host only.
+ADMISSION_CONTROL = {
+    'ENABLED': True,
+    'STORE': 'courses.admission.SQLiteCounterStore',
+    'STORE_OPTIONS': {'path': BASE_DIR / 'admission.sqlite3'},
+    'USER_RATE': (5, 20),
+    'COURSE_RATE': (50, 100),
+    'MAX_CONCURRENT_WRITES': 16,
+    'SLOT_TIMEOUT': 30,
+}
+
+# In-process enrollment index (courses/enrollment_index.py): how long a worker
+# may answer from its index before replaying other workers' changes from the
+# change log.
+ENROLLMENT_INDEX_MAX_STALENESS = 0.25
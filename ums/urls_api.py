@@ -0,0 +1,11 @@
+"""ums URL Configuration for API-only workers.
+
+Selected with UMS_WORKER_ROLE=api; see ROOT_URLCONF in ums/settings.py.
+Serves only the DRF endpoints so the frontend views, templates and admin
+URL conf are never imported.
+"""
+from django.urls import path, include
+
+urlpatterns = [
+    path('api/', include('courses.urls')),
+]
@@ -0,0 +1,13 @@
+"""ums URL Configuration for frontend-only workers.
+
+Selected with UMS_WORKER_ROLE=frontend; see ROOT_URLCONF in ums/settings.py.
+Serves the professor portal and the admin without importing rest_framework
+or the DRF router.
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include('courses.frontend_urls')),
+]